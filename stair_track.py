@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from streamlit_option_menu import option_menu
 
@@ -12,72 +11,130 @@ HEIGHT_PER_FLIGHT = 8          # Each flight is roughly 8 feet
 TOTAL_FLIGHTS_KINABALU = TOTAL_HEIGHT_KINABALU / HEIGHT_PER_FLIGHT  # Total flights
 DATA_FILE = 'stairs_data.csv'
 
-# Function to load data
-def load_data():
+# Function to load data (cached; the file's mtime is the cache key so edits invalidate it)
+@st.cache_data(show_spinner=False)
+def load_data(mtime: float):
     if os.path.exists(DATA_FILE):
-        data = pd.read_csv(DATA_FILE, parse_dates=["Date"])
-        data['Date'] = pd.to_datetime(data['Date']).dt.date  # Convert to date only
-        return data
+        # The pyarrow reader parses the ISO dates straight into datetime64, even for an empty file
+        return pd.read_csv(DATA_FILE, engine='pyarrow', parse_dates=["Date"], dtype={"Flights": "int32"})
     else:
-        return pd.DataFrame(columns=["Date", "Flights"])
+        return pd.DataFrame({"Date": pd.Series(dtype='datetime64[ns]'), "Flights": pd.Series(dtype='int32')})
+
+# Function to drop every cached view of the data after a write (mtime alone can miss writes in the same tick)
+def clear_data_caches():
+    for cached in (load_data, compute_aggregates, recorded_dates, trend_figures):
+        cached.clear()
 
 # Function to save data
 def save_data(data):
-    data['Date'] = pd.to_datetime(data['Date']).dt.date  # Ensure date-only format before saving
-    data.to_csv(DATA_FILE, index=False)
+    if not pd.api.types.is_datetime64_any_dtype(data['Date']):
+        data = data.assign(Date=pd.to_datetime(data['Date']))  # Only convert when not datetime64 already
+    tmp_file = DATA_FILE + '.tmp'
+    data.to_csv(tmp_file, index=False, date_format='%Y-%m-%d')  # Date-only, via pandas' vectorized formatter
+    os.replace(tmp_file, DATA_FILE)  # Swap in atomically so an interrupted save never truncates the data
+    clear_data_caches()
+
+# Function to add a single entry by appending one row instead of rewriting the file
+def append_entry(date, flights):
+    size = os.path.getsize(DATA_FILE) if os.path.exists(DATA_FILE) else 0
+    with open(DATA_FILE, 'a+b') as f:
+        if size == 0:
+            f.write(b"Date,Flights\n")
+        else:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":  # A hand-edited file may lack the final newline
+                f.write(b"\n")
+        f.write(f"{date},{flights}\n".encode())
+    clear_data_caches()
+
+# Function to get the data file's version (its mtime, or 0 when there is no file yet)
+def data_version():
+    return os.path.getmtime(DATA_FILE) if os.path.exists(DATA_FILE) else 0
+
+# Function to get the current data (served from load_data's cache until the file changes)
+def current_data():
+    return load_data(data_version())
+
+# Function to get the recorded dates as ISO strings (immutable, so shared rather than copied per rerun)
+@st.cache_resource(show_spinner=False, max_entries=1)
+def recorded_dates(version: float):
+    return frozenset(load_data(version)['Date'].dt.strftime('%Y-%m-%d'))
+
+# Function to get ISO week numbers straight from datetime64[D] values
+def iso_weeks(days):
+    weekday = (days.astype(np.int64) + 3) % 7  # Monday = 0; 1970-01-01 was a Thursday
+    thursday = days - weekday + 3              # An ISO week belongs to the year of its Thursday
+    year_start = thursday.astype('datetime64[Y]').astype('datetime64[D]')
+    return (thursday - year_start).astype(np.int64) // 7 + 1
+
+# Function to total flights per integer bucket (ISO week, month) in one bincount pass
+def bucket_sums(keys, flights, name):
+    counts = np.bincount(keys)
+    sums = np.bincount(keys, weights=flights).astype(np.int64)
+    present = np.flatnonzero(counts)  # Only buckets with entries, as a groupby would keep
+    return pd.Series(sums[present], index=pd.Index(present, name=name), name='Flights')
+
+# Function to compute daily/weekly/monthly totals once per data file version (cached across reruns)
+@st.cache_data(show_spinner=False, max_entries=1)
+def compute_aggregates(version: float):
+    data = load_data(version)
+    if data.empty:
+        empty = pd.Series(dtype='int64')
+        return {'daily': empty, 'weekly': empty, 'monthly': empty, 'total': 0,
+                'daily_avg': 0, 'weekly_avg': 0, 'monthly_avg': 0}
+
+    days = data['Date'].to_numpy(dtype='datetime64[D]')
+    flights = data['Flights'].to_numpy()
+    total = flights.sum()
+
+    # Data Entry refuses duplicate dates, so every row already is one day's total
+    daily = pd.Series(flights, index=pd.DatetimeIndex(days, name='Date'), name='Flights').sort_index()
+    weekly = bucket_sums(iso_weeks(days), flights, 'Week')
+    monthly = bucket_sums(days.astype('datetime64[M]').astype(np.int64) % 12 + 1, flights, 'Month')
+    return {'daily': daily, 'weekly': weekly, 'monthly': monthly, 'total': total,
+            'daily_avg': total / max(np.unique(days).size, 1),
+            'weekly_avg': weekly.mean(), 'monthly_avg': monthly.mean()}
 
 # Function to calculate averages
-def calculate_averages(data):
-    if not data.empty:
-        # Ensure 'Date' column is in datetime format
-        data['Date'] = pd.to_datetime(data['Date'], errors='coerce')
-
-        # Now you can safely use the .dt accessor
-        data['Week'] = data['Date'].dt.isocalendar().week
-        data['Month'] = data['Date'].dt.month
-        
-        daily_avg = data.groupby('Date')['Flights'].sum().mean()
-        weekly_avg = data.groupby('Week')['Flights'].sum().mean()
-        monthly_avg = data.groupby('Month')['Flights'].sum().mean()
-    else:
-        daily_avg, weekly_avg, monthly_avg = 0, 0, 0
-        
-    return daily_avg, weekly_avg, monthly_avg
+def calculate_averages(version: float):
+    aggregates = compute_aggregates(version)
+    return aggregates['daily_avg'], aggregates['weekly_avg'], aggregates['monthly_avg']
 
 # Predict completion date based on current progress
-def predict_completion_date(data):
-    if not data.empty:
-        total_flights_climbed = data['Flights'].sum()
-        daily_avg = data.groupby('Date')['Flights'].sum().mean()
-        if daily_avg > 0:
-            remaining_flights = TOTAL_FLIGHTS_KINABALU - total_flights_climbed
-            days_to_completion = remaining_flights / daily_avg
-            completion_date = datetime.today() + timedelta(days=days_to_completion)
-            return completion_date.strftime('%Y-%m-%d'), int(days_to_completion)
+def predict_completion_date(total_flights_climbed, daily_avg):
+    if daily_avg > 0:
+        remaining_flights = TOTAL_FLIGHTS_KINABALU - total_flights_climbed
+        days_to_completion = remaining_flights / daily_avg
+        completion_date = datetime.today() + timedelta(days=days_to_completion)
+        return completion_date.strftime('%Y-%m-%d'), int(days_to_completion)
     return None, None
 
-# Edit or delete data
-def modify_data(data):
-    if not data.empty:
-        st.subheader("Edit or Delete Data")
-        date_to_modify = st.selectbox("Select Date to Edit/Delete", data["Date"].astype(str))  # Date as string
-        if date_to_modify:
-            row = data[data["Date"].astype(str) == date_to_modify]
-            st.write(f"Current Data for {date_to_modify}: {row['Flights'].values[0]} flights")
-            
-            # Edit the data
-            if st.button("Edit Data"):
-                new_flights = st.number_input("New number of flights", value=int(row['Flights'].values[0]))
-                data.loc[data["Date"].astype(str) == date_to_modify, "Flights"] = new_flights
-                st.success("Data updated successfully!")
-                save_data(data)
-            
-            # Delete the data
-            if st.button("Delete Data"):
-                data = data[data["Date"].astype(str) != date_to_modify]
-                st.success(f"Data for {date_to_modify} deleted.")
-                save_data(data)
-    return data
+# Function to build a WebGL line chart from a totals series
+def line_figure(series, title):
+    import plotly.graph_objects as go  # Deferred so the other tabs never pay for importing plotly
+    fig = go.Figure(go.Scattergl(x=series.index, y=series.values, mode='lines'))
+    fig.update_layout(title=title, xaxis_title=series.index.name, yaxis_title='Flights')
+    return fig
+
+# Function to build the trend charts once per data file version (shared across reruns)
+@st.cache_resource(show_spinner=False, max_entries=1)
+def trend_figures(version: float):
+    aggregates = compute_aggregates(version)
+    return (line_figure(aggregates['daily'], 'Daily Flights Pattern'),
+            line_figure(aggregates['weekly'], 'Weekly Flights Pattern'),
+            line_figure(aggregates['monthly'], 'Monthly Flights Pattern'))
+
+# Function to build the climb progress gauge once; reruns only update the climbed height
+@st.cache_resource(show_spinner=False)
+def progress_figure():
+    import plotly.graph_objects as go  # Deferred, as in line_figure
+    return go.Figure(go.Indicator(
+        mode='gauge+number',
+        value=0,
+        number={'suffix': ' ft'},
+        gauge={'axis': {'range': [0, TOTAL_HEIGHT_KINABALU]}, 'bar': {'color': 'lightskyblue'}},
+        title={'text': "Your Climb vs Gunung Kinabalu"}
+    ))
 
 # Main layout
 st.set_page_config(page_title="Stair Trek 🧗‍♂️🏔️", layout="wide")
@@ -111,21 +168,28 @@ st.markdown("""
     .card h6 {
         color: #fafafa;
     }
+    .card-row {
+        display: flex;
+    }
+    .card-row .card {
+        flex: 1;        /* Equal-width cards across the row */
+    }
     </style>
 """, unsafe_allow_html=True)
 
-# Function to display metrics in a card-like style
-def display_card(title, value, unit=None):
-    st.markdown(
-        f"""
-        <div class="card">
-            <h4>{title}</h4>
-            <h1>{value}</h1>
-            {"<h6>" + unit + "</h6>" if unit else ""}
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+# HTML templates for the metric cards
+CARD_TEMPLATE = '<div class="card"><h4>{title}</h4><h1>{value}</h1>{unit}</div>'
+CARD_UNIT_TEMPLATE = '<h6>{unit}</h6>'
+
+# Function to render one metric card as HTML
+def card_html(title, value, unit=None):
+    return CARD_TEMPLATE.format(title=title, value=value,
+                                unit=CARD_UNIT_TEMPLATE.format(unit=unit) if unit else "")
+
+# Function to display a row of metric cards as a single markdown element
+def display_card_row(cards):
+    html = ''.join(card_html(title, value, unit) for title, value, unit in cards)
+    st.markdown(f'<div class="card-row">{html}</div>', unsafe_allow_html=True)
 
 # Sidebar menu for tabs
 selected = option_menu(
@@ -137,57 +201,37 @@ selected = option_menu(
     orientation="horizontal",
 )
 
-# Load existing data
-data = load_data()
-
 # Dashboard Tab
-if selected == "Dashboard":
+@st.experimental_fragment
+def dashboard_fragment():
+    version = data_version()
+    data = load_data(version)
     st.header("Dashboard")
-    
+
+    # Derive every metric once, ahead of the layout that displays them
+    total_flights = int(compute_aggregates(version)['total'])
+    height_climbed = total_flights * HEIGHT_PER_FLIGHT
+    progress = total_flights / TOTAL_FLIGHTS_KINABALU * 100
+    daily_avg, weekly_avg, monthly_avg = calculate_averages(version)
 
     # Row 1: Comparison chart (left) and Averages graphs (right)
     col_left, col_right = st.columns(2, gap="medium", )
 
     with col_left:
-        # Comparison graph: Height Climbed vs Gunung Kinabalu
+        # Progress gauge: Height Climbed out of Gunung Kinabalu's height
         with st.container(border=True):
             st.subheader("Progress")
-            total_flights = data['Flights'].sum()
-            height_climbed = total_flights * HEIGHT_PER_FLIGHT
-            fig = go.Figure()
-            fig.add_trace(go.Bar(
-                x=['Your Progress'],
-                y=[height_climbed],
-                name='Height Climbed',
-                marker_color='lightskyblue'
-            ))
-            fig.add_trace(go.Bar(
-                x=['Gunung Kinabalu'],
-                y=[TOTAL_HEIGHT_KINABALU],
-                name='Gunung Kinabalu',
-                marker_color='lightgreen'
-            ))
-            fig.update_layout(title="Comparison: Your Climb vs Gunung Kinabalu",
-                            yaxis=dict(title='Height (in feet)'),
-                            xaxis=dict(title='Comparison'),
-                            showlegend=False,
-                            yaxis_range=[0, TOTAL_HEIGHT_KINABALU])
+            fig = progress_figure()
+            fig.data[0].value = height_climbed
             st.plotly_chart(fig)
 
     with col_right:
         # Display averages in 3 stacked plots: Daily, Weekly, Monthly patterns
         with st.container(border=True):
             st.subheader("Averages Over Time")
-            daily_avg, weekly_avg, monthly_avg = calculate_averages(data)
-
             if not data.empty:
-                daily_fig = px.line(data.groupby('Date')['Flights'].sum().reset_index(), x='Date', y='Flights',
-                                    title='Daily Flights Pattern')
-                weekly_fig = px.line(data.groupby('Week')['Flights'].sum().reset_index(), x='Week', y='Flights',
-                                    title='Weekly Flights Pattern')
-                monthly_fig = px.line(data.groupby('Month')['Flights'].sum().reset_index(), x='Month', y='Flights',
-                                    title='Monthly Flights Pattern')
-                
+                daily_fig, weekly_fig, monthly_fig = trend_figures(version)
+
                 st.plotly_chart(daily_fig)
                 st.plotly_chart(weekly_fig)
                 st.plotly_chart(monthly_fig)
@@ -195,17 +239,11 @@ if selected == "Dashboard":
     # Row 2: Display Progress Metrics
     with st.container(border=True):
         st.subheader("Progress", )
-        col_1, col_2, col_3 = st.columns(3)
-        progress = total_flights / TOTAL_FLIGHTS_KINABALU * 100
-        
-        with col_1:
-            display_card("Flights Climbed", total_flights, "flights")
-
-        with col_2:
-            display_card("Height Climbed", f"{height_climbed:.2f}", "feet")
-
-        with col_3:
-            display_card("Progress", f"{progress:.2f}%", None)
+        display_card_row([
+            ("Flights Climbed", total_flights, "flights"),
+            ("Height Climbed", f"{height_climbed:.2f}", "feet"),
+            ("Progress", f"{progress:.2f}%", None),
+        ])
 
         # Progress bar
         st.progress(progress / 100)
@@ -213,32 +251,24 @@ if selected == "Dashboard":
     # Row 3: Completion Prediction Metrics
     with st.container(border=True):
         st.subheader("Predictions")
-        completion_date, days_remaining = predict_completion_date(data)
-
-        col_1_completion, col_2_completion = st.columns(2)
-
-        with col_1_completion:
-            display_card("Estimated Completion Date", completion_date if completion_date else "N/A")
-
-        with col_2_completion:
-            display_card("Days Remaining", days_remaining if days_remaining else "N/A", "days")
+        completion_date, days_remaining = predict_completion_date(total_flights, daily_avg)
+        display_card_row([
+            ("Estimated Completion Date", completion_date if completion_date else "N/A", None),
+            ("Days Remaining", days_remaining if days_remaining else "N/A", "days"),
+        ])
 
     # Row 4: Display Averages Metrics
     with st.container(border=True):
         st.subheader("Averages")
-        col_1_avg, col_2_avg, col_3_avg = st.columns(3)
-
-        with col_1_avg:
-            display_card("Daily Average", f"{daily_avg:.2f}", "flights")
-
-        with col_2_avg:
-            display_card("Weekly Average", f"{weekly_avg:.2f}", "flights")
-
-        with col_3_avg:
-            display_card("Monthly Average", f"{monthly_avg:.2f}", "flights")
+        display_card_row([
+            ("Daily Average", f"{daily_avg:.2f}", "flights"),
+            ("Weekly Average", f"{weekly_avg:.2f}", "flights"),
+            ("Monthly Average", f"{monthly_avg:.2f}", "flights"),
+        ])
 
 # Data Entry Tab
-elif selected == "Data Entry":
+@st.experimental_fragment
+def entry_fragment():
     st.header("Data Entry")
     
     # Add today's data
@@ -249,30 +279,50 @@ elif selected == "Data Entry":
 
         # Add data to the table
         if st.button("Add Entry"):
-            if today in data['Date'].astype(str).values:  # Check date string, no time part
+            if today in recorded_dates(data_version()):  # Check date string, no time part
                 st.warning("You've already added data for today.")
             else:
-                new_entry = pd.DataFrame({"Date": [today], "Flights": [flights]})
-                data = pd.concat([data, new_entry], ignore_index=True)
-                save_data(data)
+                append_entry(today, flights)
                 st.success("Entry added!")
                 st.balloons()
 
-    
-    # Edit or delete data
-    with st.container(border=True):
-        data = modify_data(data)
-
 # Historical Data
-elif selected == "Historical Data":
+@st.experimental_fragment
+def history_fragment():
+    data = current_data()
     st.header("Historical Data")
 
-    # Display data
+    # Display data; edits and deleted rows in the table are saved straight back
     st.subheader("Flight of Stairs History")
-    st.dataframe(data, use_container_width=True)
+    edited = st.data_editor(data, num_rows="dynamic", use_container_width=True, key="history",
+                            column_config={
+                                "Date": st.column_config.DateColumn(format="YYYY-MM-DD", required=True),
+                                "Flights": st.column_config.NumberColumn(min_value=0, step=1, required=True),
+                            })
+    if not edited.equals(data):
+        if edited.isna().any(axis=None):
+            st.info("Fill in both the date and the flights to save a new row.")
+        elif edited['Date'].duplicated().any():
+            st.warning("Each date can only have one entry.")
+        else:
+            # Added rows come back with Flights as float64; store them as whole numbers again
+            save_data(edited.astype({'Flights': 'int32'}))
+            # The editor's id depends on its data, so rerun to start the next edit from the saved file
+            st.session_state['history_saved'] = True
+            st.rerun()
+    if st.session_state.pop('history_saved', False):
+        st.success("History updated!")
     
     # Add a reset button to clear all data
     if st.button("Reset Data"):
         data = pd.DataFrame(columns=["Date", "Flights"])
         save_data(data)
         st.warning("All data has been reset.")
+
+# Render the selected tab; widget interactions inside it rerun only that fragment
+if selected == "Dashboard":
+    dashboard_fragment()
+elif selected == "Data Entry":
+    entry_fragment()
+elif selected == "Historical Data":
+    history_fragment()